@@ -1,12 +1,23 @@
-import json
 import logging
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from urllib.parse import urlparse, parse_qs
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote_plus
+
+import fastjsonschema
+import orjson
 
 logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.INFO)
 
 HOST_NAME = "localhost"
 SERVER_PORT = 4000
+WORKER_COUNT = int(os.environ.get('KEY_VALUE_DB_WORKERS', os.cpu_count() or 1))
+LOG_PATH = os.environ.get('KEY_VALUE_DB_LOG', 'key_value_db.log')
 
 OK_CODE = 200
 BAD_REQUEST_CODE = 400
@@ -14,60 +25,369 @@ NOT_FOUND_CODE = 404
 METHOD_NOT_ALLOWED_CODE = 405
 SERVER_ERROR_CODE = 500
 JSON_CONTENT_TYPES = ['application/json']
-
-key_value_dict = {}
+_REASONS = {
+    OK_CODE: 'OK',
+    BAD_REQUEST_CODE: 'Bad Request',
+    NOT_FOUND_CODE: 'Not Found',
+    METHOD_NOT_ALLOWED_CODE: 'Method Not Allowed',
+    SERVER_ERROR_CODE: 'Internal Server Error',
+}
+# The store is sharded so concurrent POSTs only contend for the lock of
+# the shard owning their key. Reads stay lock-free: a single dict.get on
+# the owning shard is atomic under CPython.
+_NUM_SHARDS = 16
+_SHARD_MASK = _NUM_SHARDS - 1
+_SHARDS = [{} for _ in range(_NUM_SHARDS)]
+_SHARD_LOCKS = [threading.Lock() for _ in range(_NUM_SHARDS)]
+_MISSING = object()
+
+
+def _shard(key):
+    """Return the dict shard that owns `key`."""
+    return _SHARDS[hash(key) & _SHARD_MASK]
+
+
+# LRU cache of serialized GET bodies so hot keys pay for orjson.dumps once
+# per write instead of once per read. Entries are dropped when their key is
+# set or deleted, and the least recently read entry is evicted at capacity.
+_RESP_CACHE_MAX = 1024
+_RESP_CACHE = OrderedDict()
+_RESP_CACHE_LOCK = threading.Lock()
+
+
+def _cached_response_body(key):
+    """Return the cached GET body for `key` (marking it recently used), or None."""
+    with _RESP_CACHE_LOCK:
+        body = _RESP_CACHE.get(key)
+        if body is not None:
+            _RESP_CACHE.move_to_end(key)
+        return body
+
+
+def _cache_response_body(key, value, body):
+    """Cache `body` for `key` unless the store has moved on from `value`.
+
+    A write can land between the shard read that produced `body` and this
+    insert; its invalidation would then precede the insert and the stale
+    body would be served until the next write to the key. Re-checking the
+    shard under the cache lock closes that window: a write that passes the
+    check before us invalidates after us, a write that beats our check
+    makes us skip the insert.
+    """
+    with _RESP_CACHE_LOCK:
+        if _shard(key).get(key, _MISSING) is not value:
+            return
+        _RESP_CACHE[key] = body
+        _RESP_CACHE.move_to_end(key)
+        if len(_RESP_CACHE) > _RESP_CACHE_MAX:
+            _RESP_CACHE.popitem(last=False)
+
+
+def _invalidate_response_body(key):
+    with _RESP_CACHE_LOCK:
+        _RESP_CACHE.pop(key, None)
+
+
+_OP_SET = 1
+_OP_DELETE = 2
+_LOG_BATCH_OPS = 64
+_LOG_FLUSH_INTERVAL = 0.05
+# Record header: op, key length, value length. Compiled once so pack/unpack
+# skip re-parsing the format string on every mutation and replayed record.
+_RECORD_HEADER = struct.Struct('<BII')
+
+
+class AppendOnlyLog:
+    """Durability log: every mutation appends one `(op, key, value)` record.
+
+    Records are accumulated in memory and written to the O_APPEND fd (then
+    fsynced) in one syscall per batch, either every _LOG_BATCH_OPS mutations
+    or - via the background flush timer - once _LOG_FLUSH_INTERVAL seconds
+    have passed since the last flush, so an idle burst never sits buffered
+    longer than the interval.
+    Batching amortizes the per-write/fsync latency across the batch, at the
+    cost that a crash can lose mutations acknowledged within the last
+    interval. Whole-batch O_APPEND writes also keep records contiguous when
+    several worker processes share the same log file.
+
+    Each record is a _RECORD_HEADER (op, key length, value length) followed
+    by the orjson-encoded key and value.
+    """
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._pending_ops = 0
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self._flush_timer = None
+
+    def start_flush_timer(self):
+        """Start the daemon thread that enforces the time-based flush bound.
+
+        Must be called once per serving process: forked workers do not
+        inherit the parent's threads.
+        """
+        if self._flush_timer is not None and self._flush_timer.is_alive():
+            return
+        self._flush_timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flush_timer.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(_LOG_FLUSH_INTERVAL)
+            with self._lock:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                if self._buffer and now - self._last_flush >= _LOG_FLUSH_INTERVAL:
+                    self._flush_locked(now)
+
+    def append(self, op, key, value):
+        key_bytes = orjson.dumps(key)
+        value_bytes = orjson.dumps(value)
+        record = _RECORD_HEADER.pack(op, len(key_bytes), len(value_bytes)) + key_bytes + value_bytes
+        with self._lock:
+            self._buffer += record
+            self._pending_ops += 1
+            now = time.monotonic()
+            if self._pending_ops >= _LOG_BATCH_OPS or now - self._last_flush >= _LOG_FLUSH_INTERVAL:
+                self._flush_locked(now)
+
+    def _flush_locked(self, now):
+        if self._buffer:
+            os.write(self._fd, self._buffer)
+            os.fsync(self._fd)
+            del self._buffer[:]
+            self._pending_ops = 0
+        self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            self._flush_locked(time.monotonic())
+            self._closed = True
+        os.close(self._fd)
+
+    @staticmethod
+    def replay(path):
+        """Yield the `(op, key, value)` records of an existing log file."""
+        try:
+            with open(path, 'rb') as log_file:
+                data = log_file.read()
+        except FileNotFoundError:
+            return
+
+        header_size = _RECORD_HEADER.size
+        offset = 0
+        while offset + header_size <= len(data):
+            op, key_len, value_len = _RECORD_HEADER.unpack_from(data, offset)
+            offset += header_size
+            if offset + key_len + value_len > len(data):
+                # Torn tail record from a crash mid-write; drop it.
+                break
+            key = orjson.loads(data[offset:offset + key_len])
+            value = orjson.loads(data[offset + key_len:offset + key_len + value_len])
+            offset += key_len + value_len
+            yield op, key, value
+
+
+def _replay_log_into_store(path):
+    """Rebuild the in-memory shards from the append-only log, if one exists."""
+    record_count = 0
+    for op, key, value in AppendOnlyLog.replay(path):
+        shard = _SHARDS[hash(key) & _SHARD_MASK]
+        if op == _OP_SET:
+            shard[key] = value
+        elif op == _OP_DELETE:
+            shard.pop(key, None)
+        record_count += 1
+    return record_count
+
+
+_LOG = AppendOnlyLog(LOG_PATH)
+
+
+def _is_json_content_type(content_type):
+    """True if the Content-Type header declares a JSON body."""
+    return bool(content_type) and any(
+        json_type in content_type for json_type in JSON_CONTENT_TYPES
+    )
+
+
+# Bodies at least this large are handed to the kernel with MSG_ZEROCOPY so
+# they are transmitted straight from our buffer instead of being copied into
+# the socket send buffer first. The constants are not exposed by the socket
+# module; values are from the Linux uapi headers.
+_ZEROCOPY_THRESHOLD = 16384
+_SO_ZEROCOPY = getattr(socket, 'SO_ZEROCOPY', 60)
+_MSG_ZEROCOPY = getattr(socket, 'MSG_ZEROCOPY', 0x4000000)
+_SO_EE_ORIGIN_ZEROCOPY = 5
+_EXTENDED_ERR = struct.Struct('<IBBBBII')  # struct sock_extended_err
+_ZEROCOPY_SUPPORTED = sys.platform == 'linux'
+
+
+def _get_key(path):
+    """Extract the `key` query parameter from a raw request path, or None if absent.
+
+    Cheaper than urlparse + parse_qs for the single parameter /get cares about:
+    no intermediate dict/list allocations, and unquoting is only applied to the
+    matching value.
+    """
+    query = path.partition('?')[2]
+    for pair in query.split('&'):
+        name, _, value = pair.partition('=')
+        if name == 'key' and value:
+            return unquote_plus(value)
+    return None
+
+
+def _build_header(code, reason, body_len):
+    """Render the status line and headers of a response to bytes."""
+    return ('HTTP/1.1 {} {}\r\n'
+            'Content-Type: application/json\r\n'
+            'Content-Length: {}\r\n'
+            '\r\n').format(code, reason, body_len).encode('latin-1')
+
+
+def _build_response(code, reason, payload):
+    """Render a complete HTTP response (status line, headers and body) to bytes."""
+    body = orjson.dumps(payload)
+    return _build_header(code, reason, len(body)) + body
+
+
+# Responses whose payload never changes are rendered once at import and
+# written to the socket in a single call.
+_GET_NOT_ALLOWED_RESPONSE = _build_response(
+    METHOD_NOT_ALLOWED_CODE, 'Method Not Allowed. Using GET instead of POST',
+    {'error': 'Method Not Allowed. Using GET instead of POST'}
+)
+_POST_NOT_ALLOWED_RESPONSE = _build_response(
+    METHOD_NOT_ALLOWED_CODE, 'Method Not Allowed. Using POST instead of GET',
+    {'error': 'Method Not Allowed. Using POST instead of GET'}
+)
+_MISSING_KEY_PARAM_RESPONSE = _build_response(
+    BAD_REQUEST_CODE, 'Missing key parameter',
+    {'error': 'Missing key parameter'}
+)
+_SERVER_ERROR_RESPONSE = _build_response(
+    SERVER_ERROR_CODE, 'Internal Server Error',
+    {'error': 'Internal Server Error'}
+)
+
+# Validators are compiled once at import and reused for every request,
+# keyed by the path prefix they validate.
+_VALIDATORS = {
+    '/set': fastjsonschema.compile({
+        'type': 'object',
+        'required': ['key', 'value'],
+        'properties': {'key': {}, 'value': {}},
+    }),
+    '/delete': fastjsonschema.compile({
+        'type': 'object',
+        'required': ['key'],
+        'properties': {'key': {}},
+    }),
+}
+_SET_VALIDATOR = _VALIDATORS['/set']
+_DELETE_VALIDATOR = _VALIDATORS['/delete']
 
 
 class KeyValueDbHandler(BaseHTTPRequestHandler):
 
+    # HTTP/1.1 keeps connections open between requests (unless the client
+    # sends `Connection: close`), so repeat clients skip the TCP handshake.
+    # Every response must then carry an accurate Content-Length.
+    protocol_version = 'HTTP/1.1'
+    # Headers for large responses should leave in their own packet right
+    # away instead of waiting for the zerocopy body send.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # Send counter -> body bytes, kept alive until the kernel reports it
+        # is done transmitting from them.
+        self._zc_pending = {}
+        self._zc_next_id = 0
+        self._zerocopy = False
+        if _ZEROCOPY_SUPPORTED:
+            try:
+                self.connection.setsockopt(socket.SOL_SOCKET, _SO_ZEROCOPY, 1)
+                self._zerocopy = True
+            except OSError:
+                pass
+
+    def finish(self):
+        if self._zc_pending:
+            # Bounded drain so the buffers of in-flight zerocopy sends stay
+            # pinned until the kernel releases them (or the wait times out).
+            try:
+                self.connection.settimeout(1.0)
+                self._reap_zerocopy_completions(blocking=True)
+            except OSError:
+                pass
+        super().finish()
+
+    def _send_body_zerocopy(self, body):
+        view = memoryview(body)
+        offset = 0
+        while offset < len(view):
+            try:
+                sent = self.connection.sendmsg([view[offset:]], [], _MSG_ZEROCOPY)
+            except OSError:
+                self.wfile.write(view[offset:])
+                return
+            self._zc_pending[self._zc_next_id] = body
+            self._zc_next_id += 1
+            offset += sent
+        self._reap_zerocopy_completions()
+
+    def _reap_zerocopy_completions(self, blocking=False):
+        flags = socket.MSG_ERRQUEUE if blocking else socket.MSG_ERRQUEUE | socket.MSG_DONTWAIT
+        while self._zc_pending:
+            try:
+                _, ancdata, _, _ = self.connection.recvmsg(0, 512, flags)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            for _, _, cmsg_data in ancdata:
+                if len(cmsg_data) < _EXTENDED_ERR.size:
+                    continue
+                _, origin, _, _, _, first_id, last_id = _EXTENDED_ERR.unpack_from(cmsg_data)
+                if origin == _SO_EE_ORIGIN_ZEROCOPY:
+                    for completed_id in range(first_id, last_id + 1):
+                        self._zc_pending.pop(completed_id, None)
+
     def _validate_request_and_load_json(self):
-        headers = dict(self.headers.items())
-        is_valid = True
-        accepts_json = True
         self.json_dict = {}
 
-        if 'Content-Length' not in headers:
-            is_valid = False
+        content_len = self.headers.get('Content-Length')
+        if content_len is None:
+            return False
 
-        content_len = int(headers.get('Content-Length', 0))
-        content_type = headers.get('Content-Type')
-        post_body = self.rfile.read(content_len)
-        try:
-            body = post_body.decode()
-        except ValueError:
-            body = ''
-
-        accepted_types = headers.get('Accept', [])
-        if accepted_types:
-            if not isinstance(accepted_types, list):
-                accepted_types = [accepted_types]
-            accepts_json = any([
-                acc_type in accepted_types for acc_type in JSON_CONTENT_TYPES + ['*/*']
-            ])
-
-        is_json_type = content_type and any(
-            json_type in content_type for json_type in JSON_CONTENT_TYPES
-        )
-
-        if not accepts_json or not is_json_type:
+        # The body must be drained even when the Content-Type check fails,
+        # or its bytes would be parsed as the next request on this
+        # keep-alive connection.
+        post_body = self.rfile.read(int(content_len))
+
+        if not _is_json_content_type(self.headers.get('Content-Type')):
             return False
 
-        json_content = body
         try:
-            self.json_dict = json.loads(json_content)
+            self.json_dict = orjson.loads(post_body)
             if self.json_dict is None:
                 self.json_dict = {}
-        except ValueError:
+        except orjson.JSONDecodeError:
             self.json_dict = {}
 
-        return is_valid
+        return True
 
-    def validate_json_request(self, expected_params):
+    def validate_json_request(self, validator):
         """
 
-        :param str | set | list | tuple expected_params: parameters expected to be present in the payload.
-                                                        Can be a str for single param or
-                                                        an iterable such as set, list, tuple for multiple params
+        :param callable validator: compiled `fastjsonschema` validator to run against the payload,
+                                   typically one of the `_VALIDATORS` entries
         :returns: 2 elements tuple:
                      1. Validation passed: 1st element is True, 2nd element is the request's payload (from json to dict)
                      2. Validation failed: 1st element is False, 2nd element is the error payload (dict with `error` key)
@@ -78,143 +398,185 @@ class KeyValueDbHandler(BaseHTTPRequestHandler):
                                          '`Content-Length` header should also be specified'}
             return False, response_payload
 
-        if not isinstance(expected_params, (set, list, tuple)):
-            expected_params = [expected_params]
-        if not all([param in self.json_dict for param in expected_params]):
+        try:
+            validator(self.json_dict)
+        except fastjsonschema.JsonSchemaException as e:
             response_payload = {
-                'error': 'Request is missing parameters. Expected: {}, Found: {}'.format(list(expected_params),
-                                                                                         list(self.json_dict.keys()))
+                'error': f'Request is missing parameters. {e.message}. Found: {list(self.json_dict.keys())}'
             }
             return False, response_payload
 
         return True, self.json_dict
 
-    def send_json_response(self, payload):
-        self.send_header("Content-type", "application/json")
-        self.end_headers()
-        self.wfile.write(bytes(json.dumps(payload), "utf-8"))
+    def _respond_body(self, code, body):
+        """Write a response with an already-serialized `body`.
+
+        Small responses go out in one write; bodies at or above
+        _ZEROCOPY_THRESHOLD are sent with MSG_ZEROCOPY when the socket
+        supports it, skipping the copy into the kernel send buffer.
+        """
+        header = _build_header(code, _REASONS[code], len(body))
+        if self._zerocopy and len(body) >= _ZEROCOPY_THRESHOLD:
+            self.wfile.write(header)
+            self._send_body_zerocopy(body)
+        else:
+            self.wfile.write(header + body)
+
+    def _respond(self, code, payload):
+        """Serialize `payload` and write the complete response."""
+        self._respond_body(code, orjson.dumps(payload))
+
+    def _handle_get(self):
+        key = _get_key(self.path)
+        if key is None:
+            self.wfile.write(_MISSING_KEY_PARAM_RESPONSE)
+            return
+
+        body = _cached_response_body(key)
+        if body is not None:
+            self._respond_body(OK_CODE, body)
+            return
+
+        value = _shard(key).get(key, _MISSING)
+        if value is _MISSING:
+            payload = {
+                'error': f'Key `{key}` does not exist in the database'
+            }
+            self._respond(NOT_FOUND_CODE, payload)
+        else:
+            body = orjson.dumps({
+                'key': key,
+                'value': value
+            })
+            _cache_response_body(key, value, body)
+            self._respond_body(OK_CODE, body)
+
+    def _handle_set(self):
+        is_valid, payload = self.validate_json_request(_SET_VALIDATOR)
+        if not is_valid:
+            self._respond(BAD_REQUEST_CODE, payload)
+            return
+
+        key = payload['key']
+        value = payload['value']
+        shard_index = hash(key) & _SHARD_MASK
+        with _SHARD_LOCKS[shard_index]:
+            old_value = _SHARDS[shard_index].get(key, _MISSING)
+            _SHARDS[shard_index][key] = value
+            # Logged under the shard lock so the log order of racing writes
+            # to one key matches the order they were applied in.
+            _LOG.append(_OP_SET, key, value)
+        _invalidate_response_body(key)
+
+        if old_value is not _MISSING:
+            logging.info('Overriding existing key %s --> %s with new value: %s', key, old_value, value)
+        else:
+            logging.info('Inserting new key-value pair: %s --> %s', key, value)
+
+        self._respond(OK_CODE, payload)
+
+    def _handle_delete(self):
+        is_valid, payload = self.validate_json_request(_DELETE_VALIDATOR)
+        if not is_valid:
+            self._respond(BAD_REQUEST_CODE, payload)
+            return
+
+        key = payload['key']
+        shard_index = hash(key) & _SHARD_MASK
+        with _SHARD_LOCKS[shard_index]:
+            value = _SHARDS[shard_index].pop(key, _MISSING)
+            if value is not _MISSING:
+                _LOG.append(_OP_DELETE, key, None)
+        _invalidate_response_body(key)
+
+        if value is not _MISSING:
+            logging.info('Deleted key-value pair: %s --> %s', key, value)
+            self._respond(OK_CODE, {
+                'key': key,
+                'value': value
+            })
+        else:
+            logging.info('Tried to delete non-existent key: %s', key)
+            payload = {
+                'message': f"'Key `{key}` does not exist",
+            }
+            self._respond(OK_CODE, payload)
+
+    def _handle_get_not_allowed(self):
+        self.wfile.write(_GET_NOT_ALLOWED_RESPONSE)
+
+    def _handle_post_not_allowed(self):
+        self.wfile.write(_POST_NOT_ALLOWED_RESPONSE)
+
+    def _handle_invalid_path(self):
+        payload = {
+            'error': f'invalid path `{self.path}`. Unavailable resource'
+        }
+        self._respond(NOT_FOUND_CODE, payload)
 
     def do_GET(self):
         try:
-            if self.path.startswith('/get'):
-                parsed_url = urlparse(self.path)
-                params = parse_qs(parsed_url.query)
-                if 'key' not in params:
-                    payload = {
-                        'error': 'Missing key parameter'
-                    }
-                    self.send_response(BAD_REQUEST_CODE, payload['error'])
-                    self.send_json_response(payload)
-                else:
-                    key = params['key'][0]
-                    if key not in key_value_dict:
-                        payload = {
-                            'error': 'Key `{}` does not exist in the database'.format(key)
-                        }
-                        self.send_response(NOT_FOUND_CODE, payload['error'])
-                        self.send_json_response(payload)
-                    else:
-                        value = key_value_dict[key]
-                        payload = {
-                            'key': key,
-                            'value': value
-                        }
-                        self.send_response(200)
-                        self.send_json_response(payload)
-
-            elif self.path.startswith('/set') or self.path.startswith('/delete'):
-                payload = {
-                    'error': 'Method Not Allowed. Using GET instead of POST'
-                }
-                self.send_response(METHOD_NOT_ALLOWED_CODE, payload['error'])
-                self.send_json_response(payload)
-
-            else:
-                payload = {
-                    'error': 'invalid path `{}`. Unavailable resource'.format(self.path)
-                }
-                self.send_response(NOT_FOUND_CODE, payload['error'])
-                self.send_json_response(payload)
-
+            _GET_ROUTES.get(self.path[1:4], KeyValueDbHandler._handle_invalid_path)(self)
         except Exception as e:
             logging.exception(e)
-            payload = {
-                'error': "Internal Server Error"
-            }
-            self.send_response(SERVER_ERROR_CODE, payload['error'])
-            self.send_json_response(payload)
+            self.wfile.write(_SERVER_ERROR_RESPONSE)
 
     def do_POST(self):
         try:
-            if self.path.startswith('/set'):
-                is_valid, payload = self.validate_json_request({'key', 'value'})
-                if not is_valid:
-                    self.send_response(BAD_REQUEST_CODE, payload['error'])
-                    self.send_json_response(payload)
-                else:
-                    key = payload['key']
-                    value = payload['value']
-                    if key in key_value_dict:
-                        logging.info(
-                            'Overriding existing key {} --> {} with new value: {}'.format(key, key_value_dict[key],
-                                                                                          value)
-                        )
-                    else:
-                        logging.info('Inserting new key-value pair: {} --> {}'.format(key, value))
-
-                    key_value_dict[key] = value
-                    self.send_response(OK_CODE)
-                    self.send_json_response(payload)
-
-            elif self.path.startswith('/delete'):
-                is_valid, payload = self.validate_json_request('key')
-                if not is_valid:
-                    self.send_response(BAD_REQUEST_CODE, payload['error'])
-                    self.send_json_response(payload)
-                else:
-                    key = payload['key']
-                    if key in key_value_dict:
-                        value = key_value_dict.pop(key)
-                        logging.info('Deleted key-value pair: {} --> {}'.format(key, value))
-                        self.send_response(OK_CODE)
-                        self.send_json_response({
-                            'key': key,
-                            'value': value
-                        })
-                    else:
-                        logging.info('Tried to delete non-existent key: {}'.format(key))
-                        payload = {
-                            'message': "'Key `{}` does not exist".format(key),
-                        }
-                        self.send_response(OK_CODE, payload['message'])
-                        self.send_json_response(payload)
-
-            elif self.path.startswith('/get'):
-                payload = {
-                    'error': 'Method Not Allowed. Using POST instead of GET'
-                }
-                self.send_response(METHOD_NOT_ALLOWED_CODE, payload['error'])
-                self.send_json_response(payload)
-
-            else:
-                payload = {
-                    'error': 'invalid path `{}`. Unavailable resource'.format(self.path)
-                }
-                self.send_response(NOT_FOUND_CODE, payload['error'])
-                self.send_json_response(payload)
-
+            _POST_ROUTES.get(self.path[1:4], KeyValueDbHandler._handle_invalid_path)(self)
         except Exception as e:
             logging.exception(e)
-            payload = {
-                'error': "Internal Server Error"
-            }
-            self.send_response(SERVER_ERROR_CODE, payload['error'])
-            self.send_json_response(payload)
+            self.wfile.write(_SERVER_ERROR_RESPONSE)
+
+
+# Route tables map the 3 characters after the leading '/' to a handler
+# method, replacing the chain of startswith checks with one dict lookup.
+_GET_ROUTES = {
+    'get': KeyValueDbHandler._handle_get,
+    'set': KeyValueDbHandler._handle_get_not_allowed,
+    'del': KeyValueDbHandler._handle_get_not_allowed,
+}
+_POST_ROUTES = {
+    'set': KeyValueDbHandler._handle_set,
+    'del': KeyValueDbHandler._handle_delete,
+    'get': KeyValueDbHandler._handle_post_not_allowed,
+}
+
+
+class ReusePortThreadingHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that lets several worker processes share one port.
+
+    With SO_REUSEPORT each worker binds its own listening socket on the same
+    (host, port) and the kernel load-balances incoming connections between
+    them. Note the store is per-process: every worker holds its own shards.
+    """
+
+    def server_bind(self):
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
 
 
 if __name__ == "__main__":
-    key_value_db_server = HTTPServer((HOST_NAME, SERVER_PORT), KeyValueDbHandler)
-    print("### Key Value Database Server started http://%s:%s ###" % (HOST_NAME, SERVER_PORT))
+    replayed_records = _replay_log_into_store(LOG_PATH)
+    if replayed_records:
+        logging.info('Replayed %s log records from %s', replayed_records, LOG_PATH)
+
+    print("### Key Value Database Server started http://%s:%s (%s workers) ###" % (HOST_NAME, SERVER_PORT,
+                                                                                   WORKER_COUNT))
+
+    # Fork the extra workers before binding; each process (parent included)
+    # then serves on its own SO_REUSEPORT socket. Ctrl+C reaches the whole
+    # process group, so every worker shuts down with the parent.
+    is_parent = True
+    if hasattr(socket, 'SO_REUSEPORT'):
+        for _ in range(WORKER_COUNT - 1):
+            if os.fork() == 0:
+                is_parent = False
+                break
+
+    _LOG.start_flush_timer()
+    key_value_db_server = ReusePortThreadingHTTPServer((HOST_NAME, SERVER_PORT), KeyValueDbHandler)
 
     try:
         key_value_db_server.serve_forever()
@@ -222,4 +584,6 @@ if __name__ == "__main__":
         pass
 
     key_value_db_server.server_close()
-    print("### Key Value Database Server stopped ###")
+    _LOG.close()
+    if is_parent:
+        print("### Key Value Database Server stopped ###")